@@ -1,13 +1,20 @@
 import requests
+import httpx
 import json
+from typing import TYPE_CHECKING
 from rapidfuzz import fuzz
-import pandas as pd
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Constants for the ACRA affiliated dataset and non‑ACRA affiliated dataset
 DATASET_ID = "d_3f960c10fed6145404ca7b821f263b87"  # ACRA
 NON_ACRA_COMPANIES_DATASET = "d_b1d2b840ab9e993570c037b706b39bb8"  # Non‑ACRA
 BASE_URL = "https://data.gov.sg/api/action/datastore_search"
 
+# Timeout for async lookups
+ASYNC_TIMEOUT = 10
+
 def search_dataset_by_filters(filters: dict, limit: int = 1, resource_id: str = DATASET_ID):
     """
     Searches the dataset using the provided filters on the specified resource.
@@ -44,7 +51,31 @@ def search_dataset_by_query(query: str, limit: int = 5, resource_id: str = DATAS
     else:
         return []
 
-def run_dataset_verifications(extracted_fields: dict, google_sheet_row: dict, similarity_threshold: float = 80) -> pd.DataFrame:
+async def search_dataset_by_query_async(query: str, limit: int = 5, resource_id: str = DATASET_ID, client: httpx.AsyncClient = None):
+    """
+    Async version of search_dataset_by_query.
+    Pass an open httpx.AsyncClient to share its connection pool across several
+    lookups; otherwise a client is opened and closed for this call.
+    Returns a list of matching records.
+    """
+    if client is None:
+        async with httpx.AsyncClient(timeout=ASYNC_TIMEOUT) as own_client:
+            return await search_dataset_by_query_async(query, limit, resource_id, own_client)
+
+    params = {
+        "resource_id": resource_id,
+        "q": query,
+        "limit": limit
+    }
+    response = await client.get(BASE_URL, params=params)
+    if response.status_code == 200:
+        result = response.json().get("result", {})
+        records = result.get("records", [])
+        return records
+    else:
+        return []
+
+def run_dataset_verifications(extracted_fields: dict, google_sheet_row: dict, similarity_threshold: float = 80) -> "pd.DataFrame":
     """
     Runs three verification rules against both the ACRA and non‑ACRA datasets:
     
@@ -60,6 +91,8 @@ def run_dataset_verifications(extracted_fields: dict, google_sheet_row: dict, si
       - Dataset (ACRA or Non‑ACRA)
       - Dataset Value
     """
+    import pandas as pd  # only needed to build the result table
+
     results = []
     
     # --- Rule 1: Extracted Company Name -> search on "entity_name" ---
@@ -39,7 +39,12 @@ def _get_openrouter_client() -> OpenAI:
     )
 
 
-def extract_entities(document_content: Union[str, bytes], custom_instructions: str, is_image: bool = False) -> Dict[str, Any]:
+def extract_entities(
+    document_content: Union[str, bytes],
+    custom_instructions: str,
+    is_image: bool = False,
+    mime_type: str = "image/png"
+) -> Dict[str, Any]:
     """
     Extract named entities from text or images using OpenRouter API.
     If `is_image` is True, process the content as an image.
@@ -48,6 +53,7 @@ def extract_entities(document_content: Union[str, bytes], custom_instructions: s
         document_content: Text content or image bytes
         custom_instructions: Additional instructions for extraction
         is_image: Whether the content is an image
+        mime_type: MIME type of image bytes (e.g. "image/jpeg"); sent as-is without decoding
 
     Returns:
         Dictionary with extracted entities
@@ -98,7 +104,7 @@ Exclude any mentions of Tertiary Infotech as the company."""
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
+                                    "url": f"data:{mime_type};base64,{base64_image}"
                                 }
                             }
                         ]
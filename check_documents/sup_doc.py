@@ -3,15 +3,13 @@ from check_documents.gemini_processor import extract_entities
 import os
 import tempfile
 from PIL import Image
-import pandas as pd
 import io
-import gspread
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+import numpy as np
 from check_documents.acra_call import run_dataset_verifications, search_dataset_by_filters, search_dataset_by_query
 from PyPDF2 import PdfReader, PdfWriter
 import json
 from typing import Dict, Any, Union
-from oauth2client.service_account import ServiceAccountCredentials
 
 # Optional imports - may not be available on all platforms
 FITZ_AVAILABLE = False
@@ -60,12 +58,14 @@ def convert_pdf_to_images(file_bytes: bytes) -> list:
         st.warning("PDF to image conversion not available (PyMuPDF not installed)")
         return []
     try:
-        doc = fitz.open("pdf", file_bytes)
-        images = []
-        for page in doc:
-            pix = page.get_pixmap()
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            images.append(img)
+        # Render at the default 72 DPI without an alpha channel (enough for the
+        # vision model) and close the document promptly to free its buffers
+        with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+            images = []
+            for page in doc:
+                pix = page.get_pixmap(alpha=False)
+                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                images.append(img)
         return images
     except Exception as e:
         st.error(f"Error converting PDF to images: {e}")
@@ -98,6 +98,10 @@ def get_google_sheet_data():
     # Construct the full path to the service account JSON file
     service_account_path = os.path.join(current_dir, "ssg-api-calls-9d65ee02e639.json")
     try:
+        # Imported here so PDF/image helpers can be used without loading the Sheets client stack
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
         # Define the scope
         scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
 
@@ -152,22 +156,22 @@ def compute_similarity(a: str, b: str) -> float:
     return fuzz.ratio(a, b)
 
 def find_best_match(extracted_fields: dict, sheet_data: list, threshold: float = 80) -> (dict, float):
-    best_match = None
-    best_score = 0
+    if not sheet_data:
+        return None, 0
     extracted_name = extracted_fields.get("name", "").lower().strip()
     extracted_uen = extracted_fields.get("uen", "").lower().strip()
-    for row in sheet_data:
-        sheet_name = str(row.get("Trainee Name (as on government ID)", "")).lower().strip()
-        sheet_uen = str(row.get("Employer UEN (mandatory if sponsorship type = employer)", "")).lower().strip()
-        name_similarity = compute_similarity(extracted_name, sheet_name)
-        if extracted_uen:
-            uen_similarity = compute_similarity(extracted_uen, sheet_uen)
-            avg_similarity = (0.6 * name_similarity) + (0.4 * uen_similarity)
-        else:
-            avg_similarity = name_similarity
-        if avg_similarity > best_score:
-            best_score = avg_similarity
-            best_match = row
+    sheet_names = [str(row.get("Trainee Name (as on government ID)", "")).lower().strip() for row in sheet_data]
+    # Score every row in one vectorized call instead of a Python loop
+    scores = process.cdist([extracted_name], sheet_names, scorer=fuzz.ratio, dtype=np.float64)[0]
+    if extracted_uen:
+        sheet_uens = [str(row.get("Employer UEN (mandatory if sponsorship type = employer)", "")).lower().strip() for row in sheet_data]
+        uen_scores = process.cdist([extracted_uen], sheet_uens, scorer=fuzz.ratio, dtype=np.float64)[0]
+        scores = (0.6 * scores) + (0.4 * uen_scores)
+    best_index = int(np.argmax(scores))  # first row wins ties
+    best_score = float(scores[best_index])
+    if best_score <= 0:
+        return None, 0
+    best_match = sheet_data[best_index]
     if best_score >= threshold:
         return best_match, best_score
     else:
@@ -215,6 +219,8 @@ def app():
     # ------------------------------
     # STREAMLIT UI & PROCESSING
     # ------------------------------
+    import pandas as pd  # only needed for the UI tables
+
     st.title("Check Documents")
 
     custom_instructions = st.text_area(
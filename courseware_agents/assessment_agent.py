@@ -12,6 +12,14 @@ Date: 26 January 2026
 
 from agents import function_tool
 from courseware_agents.base import create_agent
+from courseware_agents.completions import (
+    async_client,
+    create_completion,
+    llm_semaphore,
+    retry_with_backoff,
+    system_message,
+)
+from courseware_agents.json_utils import dumps, loads
 from courseware_agents.schemas import (
     AssessmentAgentResponse,
     SAQQuestion,
@@ -19,7 +27,61 @@ from courseware_agents.schemas import (
     CaseStudyScenario,
     FacilitatorGuideExtraction,
 )
+import asyncio
 import json
+import os
+import posixpath
+import zipfile
+from collections import OrderedDict
+from lxml import etree
+from pydantic import ValidationError
+from generate_assessment.utils.openai_agentic_SAQ import generate_saq
+from generate_assessment.utils.openai_agentic_PP import generate_pp
+from generate_assessment.utils.openai_agentic_CS import generate_cs
+from settings.model_configs import get_model_config
+
+
+def _validate_fg_data(fg_data: dict) -> dict:
+    """
+    Validate FG data against FacilitatorGuideExtraction.
+
+    Returned as a plain dict, since the generators read nested fields with
+    dict access.
+    """
+    return FacilitatorGuideExtraction.model_validate(fg_data).model_dump()
+
+
+def _generated_nothing(result) -> bool:
+    """True if an assessment generator produced no questions."""
+    return not result or not result.get("questions")
+
+
+async def _run_generator(generator, extracted_data: dict, model_choice: str):
+    """
+    Run an assessment generator on validated FG data.
+
+    The generators make blocking OpenAI SDK calls, so each one runs on its
+    own event loop in a worker thread; llm_semaphore bounds how many run at
+    once. As in the app, no retrieval index or model client is passed (the
+    generators build their own client from model_choice).
+    """
+    async def _generate():
+        async with llm_semaphore():
+            return await asyncio.to_thread(
+                asyncio.run, generator(extracted_data, None, None, model_choice)
+            )
+
+    # The generators catch their own API errors and skip failed questions,
+    # so a transient outage shows up as a result with no questions
+    return await retry_with_backoff(_generate, retry_if=_generated_nothing)
+
+
+# Assessment type -> generator, used by the batched tool
+_ASSESSMENT_GENERATORS = {
+    "SAQ": generate_saq,
+    "PP": generate_pp,
+    "CS": generate_cs,
+}
 
 
 @function_tool
@@ -33,22 +95,14 @@ async def generate_saq_questions(
 
     Args:
         fg_data_json: Facilitator Guide data as JSON string
-        slides_data: Optional slide deck content as text
+        slides_data: Optional slide deck content (not used yet; generation works from the FG data)
         model_choice: Model to use for generation
 
     Returns:
         Generated SAQ questions and answers as JSON string
     """
-    from generate_assessment.utils.openai_agentic_SAQ import generate_saq
-
-    fg_data = json.loads(fg_data_json)
-    slides = slides_data if slides_data else None
-
-    result = await generate_saq(
-        fg_data=fg_data,
-        slides_data=slides,
-        model_choice=model_choice
-    )
+    extracted_data = _validate_fg_data(json.loads(fg_data_json))
+    result = await _run_generator(generate_saq, extracted_data, model_choice)
     return json.dumps({"status": "success", "type": "SAQ", "data": result})
 
 
@@ -63,22 +117,14 @@ async def generate_practical_performance(
 
     Args:
         fg_data_json: Facilitator Guide data as JSON string
-        slides_data: Optional slide deck content as text
+        slides_data: Optional slide deck content (not used yet; generation works from the FG data)
         model_choice: Model to use for generation
 
     Returns:
         Generated PP assessment as JSON string
     """
-    from generate_assessment.utils.openai_agentic_PP import generate_pp
-
-    fg_data = json.loads(fg_data_json)
-    slides = slides_data if slides_data else None
-
-    result = await generate_pp(
-        fg_data=fg_data,
-        slides_data=slides,
-        model_choice=model_choice
-    )
+    extracted_data = _validate_fg_data(json.loads(fg_data_json))
+    result = await _run_generator(generate_pp, extracted_data, model_choice)
     return json.dumps({"status": "success", "type": "PP", "data": result})
 
 
@@ -93,23 +139,232 @@ async def generate_case_study(
 
     Args:
         fg_data_json: Facilitator Guide data as JSON string
-        slides_data: Optional slide deck content as text
+        slides_data: Optional slide deck content (not used yet; generation works from the FG data)
         model_choice: Model to use for generation
 
     Returns:
         Generated case study as JSON string
     """
-    from generate_assessment.utils.openai_agentic_CS import generate_cs
+    extracted_data = _validate_fg_data(json.loads(fg_data_json))
+    result = await _run_generator(generate_cs, extracted_data, model_choice)
+    return json.dumps({"status": "success", "type": "CS", "data": result})
+
+
+@function_tool
+async def generate_all_assessments(
+    fg_data_json: str,
+    slides_data: str = "",
+    model_choice: str = "DeepSeek-Chat",
+    types: str = "SAQ,PP,CS"
+) -> str:
+    """
+    Generate several assessment types concurrently from the same FG data.
 
+    Args:
+        fg_data_json: Facilitator Guide data as JSON string
+        slides_data: Optional slide deck content (not used yet; generation works from the FG data)
+        model_choice: Model to use for generation
+        types: Comma-separated assessment types to generate (SAQ, PP, CS)
+
+    Returns:
+        Generated assessments keyed by type as JSON string
+    """
     fg_data = json.loads(fg_data_json)
-    slides = slides_data if slides_data else None
 
-    result = await generate_cs(
-        fg_data=fg_data,
-        slides_data=slides,
-        model_choice=model_choice
+    selected = []
+    for assessment_type in types.split(","):
+        assessment_type = assessment_type.strip().upper()
+        if assessment_type and assessment_type not in selected:
+            selected.append(assessment_type)
+
+    unknown = [t for t in selected if t not in _ASSESSMENT_GENERATORS]
+    if unknown:
+        return json.dumps({
+            "status": "error",
+            "message": f"Unsupported assessment types: {', '.join(unknown)}"
+        })
+
+    # Validated once and shared by every generator
+    try:
+        extracted_data = _validate_fg_data(fg_data)
+    except ValidationError as e:
+        return json.dumps({"status": "error", "message": f"Invalid FG data: {e}"})
+
+    results = await asyncio.gather(
+        *(_run_generator(_ASSESSMENT_GENERATORS[t], extracted_data, model_choice) for t in selected),
+        return_exceptions=True
     )
-    return json.dumps({"status": "success", "type": "CS", "data": result})
+
+    assessments = {}
+    errors = {}
+    for assessment_type, result in zip(selected, results):
+        if isinstance(result, Exception):
+            errors[assessment_type] = str(result)
+        else:
+            assessments[assessment_type] = result
+
+    response = {"status": "success" if not errors else "partial", "assessments": assessments}
+    if errors:
+        response["errors"] = errors
+    return json.dumps(response)
+
+
+# WordprocessingML tags (Clark notation) used when parsing FG documents.
+# Text is read straight from the XML instead of through python-docx wrappers.
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P = f"{_W_NS}p"
+_W_T = f"{_W_NS}t"
+_W_TBL = f"{_W_NS}tbl"
+_W_TR = f"{_W_NS}tr"
+_W_TC = f"{_W_NS}tc"
+_W_BODY = f"{_W_NS}body"
+_W_R = f"{_W_NS}r"
+_W_TAB = f"{_W_NS}tab"
+_W_PTAB = f"{_W_NS}ptab"
+_W_BR = f"{_W_NS}br"
+_W_CR = f"{_W_NS}cr"
+_W_NO_BREAK_HYPHEN = f"{_W_NS}noBreakHyphen"
+_W_TYPE = f"{_W_NS}type"
+_W_VAL = f"{_W_NS}val"
+_W_TC_PR = f"{_W_NS}tcPr"
+_W_GRID_SPAN = f"{_W_NS}gridSpan"
+_W_V_MERGE = f"{_W_NS}vMerge"
+
+# Run-level elements that stand for characters, as python-docx's Run.text maps them
+_RUN_CHARS = {_W_TAB: "\t", _W_PTAB: "\t", _W_CR: "\n", _W_NO_BREAK_HYPHEN: "-"}
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
+# Static system prompt for interpret_fg_content. Kept separate from the
+# per-call payload so providers can serve it from their prompt cache.
+_FG_SYSTEM_PROMPT = """You are an expert at analyzing educational documents, specialising in WSQ Facilitator Guides (FG).
+
+You will receive the raw contents of a Facilitator Guide as JSON with two keys:
+- "content": a list of paragraph strings in document order
+- "tables": a list of tables, each a list of rows, each row a list of cell strings
+
+Analyze the content and extract:
+1. Learning Outcomes (LOs)
+2. Topics covered
+3. Key activities
+4. Assessment criteria
+
+## Extraction Rules
+
+### Learning Outcomes
+- Learning outcomes are usually numbered "LO1", "LO2", ... and start with an action verb
+- Keep the LO identifier and the full outcome statement exactly as written
+- If an LO spans several paragraphs or table cells, join the parts with a single space
+
+### Topics
+- Topics are usually headed "Topic 1", "Topic 2", ... or listed in a course outline table
+- For each topic record its title, its subtopics or key points, and the LOs it addresses
+- Preserve the order in which topics appear in the document
+
+### Key Activities
+- Activities include exercises, discussions, case studies, demonstrations and practical tasks
+- For each activity record a short name, a one-sentence description and the related topic
+
+### Assessment Criteria
+- Include assessment methods (e.g. written assessment, practical performance, case study)
+- Include Knowledge (K) and Ability (A) statements with their identifiers when present
+- Include any stated duration, marking or competency requirements
+
+## General Rules
+- Use only information present in the content; do not invent outcomes, topics or criteria
+- Ignore headers, footers, page numbers, version histories and document control tables
+- Normalise whitespace, but otherwise keep the original wording
+- Use empty lists for sections that are not present in the document
+
+## Output Format
+Return a structured JSON object with these sections:
+{
+    "learning_outcomes": [{"id": "LO1", "description": "..."}],
+    "topics": [{"title": "...", "subtopics": ["..."], "learning_outcomes": ["LO1"]}],
+    "key_activities": [{"name": "...", "description": "...", "topic": "..."}],
+    "assessment_criteria": [{"method": "...", "criteria": ["..."]}]
+}"""
+
+
+# Parsed FG results keyed on (absolute path, mtime_ns, size), so repeated
+# tool calls against an unchanged document skip re-parsing
+FG_PARSE_CACHE_SIZE = 32
+_fg_parse_cache: "OrderedDict[tuple, str]" = OrderedDict()
+
+
+def _paragraph_text(element) -> str:
+    """
+    Text of a w:p element, matching python-docx's Paragraph.text: tabs become
+    "\t" and line breaks "\n" (page and column breaks add nothing).
+    """
+    parts = []
+    for node in element.iter(_W_T, _W_TAB, _W_PTAB, _W_BR, _W_CR, _W_NO_BREAK_HYPHEN):
+        if node.tag == _W_T:
+            parts.append(node.text or "")
+        elif node.getparent().tag != _W_R:
+            # e.g. w:tab tab-stop definitions inside paragraph properties
+            continue
+        elif node.tag == _W_BR:
+            if node.get(_W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        else:
+            parts.append(_RUN_CHARS[node.tag])
+    return "".join(parts)
+
+
+def _read_docx_body(file_path: str):
+    """
+    Parse only the main document part of a DOCX and return its w:body element.
+
+    Avoids loading the full package (styles, numbering, images, headers)
+    as python-docx's Document() does, since only body text is needed.
+    """
+    with zipfile.ZipFile(file_path) as docx_zip:
+        part_name = "word/document.xml"
+        rels = etree.fromstring(docx_zip.read("_rels/.rels"))
+        for rel in rels.iter(f"{_PKG_REL_NS}Relationship"):
+            if rel.get("Type") == _OFFICE_DOCUMENT_REL:
+                part_name = posixpath.normpath(rel.get("Target").lstrip("/"))
+                break
+        root = etree.fromstring(docx_zip.read(part_name))
+    return root.find(_W_BODY)
+
+
+def _cell_text(cell) -> str:
+    """Text of a w:tc element, with paragraphs separated by newlines (as in _Cell.text)."""
+    return "\n".join(_paragraph_text(p) for p in cell.iterchildren(_W_P)).strip()
+
+
+def _row_texts(row, above: list) -> list:
+    """
+    Cell texts of a w:tr element, one per grid column, as python-docx's
+    row.cells yields them: a cell spanning several columns (gridSpan) is
+    repeated, and a vertically merged continuation cell (vMerge) repeats the
+    text of the cell above.
+
+    Args:
+        row: w:tr element
+        above: Texts of the previous row, by grid column
+    """
+    texts = []
+    for cell in row.iterchildren(_W_TC):
+        span = 1
+        continued = False
+        tc_pr = cell.find(_W_TC_PR)
+        if tc_pr is not None:
+            grid_span = tc_pr.find(_W_GRID_SPAN)
+            if grid_span is not None:
+                span = max(int(grid_span.get(_W_VAL, "1")), 1)
+            v_merge = tc_pr.find(_W_V_MERGE)
+            continued = v_merge is not None and v_merge.get(_W_VAL, "continue") == "continue"
+
+        column = len(texts)
+        if continued and column < len(above):
+            text = above[column]
+        else:
+            text = _cell_text(cell)
+        texts.extend([text] * span)
+    return texts
 
 
 @function_tool
@@ -123,30 +378,34 @@ def parse_facilitator_guide(file_path: str) -> str:
     Returns:
         Parsed FG data as JSON string
     """
-    from docx import Document
-    from docx.text.paragraph import Paragraph
-    from docx.oxml.text.paragraph import CT_P
-    from docx.oxml.table import CT_Tbl
-    from docx.table import Table
+    stat = os.stat(file_path)
+    cache_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+    cached = _fg_parse_cache.get(cache_key)
+    if cached is not None:
+        _fg_parse_cache.move_to_end(cache_key)
+        return cached
 
-    doc = Document(file_path)
     data = {"content": [], "tables": []}
 
-    for element in doc.element.body:
-        if isinstance(element, CT_P):
-            para = Paragraph(element, doc)
-            text = para.text.strip()
+    for element in _read_docx_body(file_path):
+        if element.tag == _W_P:
+            text = _paragraph_text(element).strip()
             if text:
                 data["content"].append(text)
-        elif isinstance(element, CT_Tbl):
-            table = Table(element, doc)
+        elif element.tag == _W_TBL:
             table_data = []
-            for row in table.rows:
-                row_data = [cell.text.strip() for cell in row.cells]
+            row_data = []
+            for row in element.iterchildren(_W_TR):
+                row_data = _row_texts(row, row_data)
                 table_data.append(row_data)
             data["tables"].append(table_data)
 
-    return json.dumps(data)
+    result = dumps(data)
+    _fg_parse_cache[cache_key] = result
+    while len(_fg_parse_cache) > FG_PARSE_CACHE_SIZE:
+        _fg_parse_cache.popitem(last=False)
+    return result
 
 
 @function_tool
@@ -164,39 +423,23 @@ async def interpret_fg_content(
     Returns:
         Structured FG data as JSON string
     """
-    from settings.model_configs import get_model_config
-    from openai import OpenAI
-
-    raw_data = json.loads(raw_data_json)
+    raw_data = loads(raw_data_json)
     config = get_model_config(model_choice)
 
-    client = OpenAI(
+    async with async_client(
         api_key=config["config"]["api_key"],
         base_url=config["config"]["base_url"]
-    )
-
-    prompt = f"""Analyze this Facilitator Guide content and extract:
-1. Learning Outcomes (LOs)
-2. Topics covered
-3. Key activities
-4. Assessment criteria
-
-Content:
-{json.dumps(raw_data, indent=2)}
-
-Return a structured JSON with these sections."""
-
-    response = client.chat.completions.create(
-        model=config["config"]["model"],
-        temperature=config["config"]["temperature"],
-        messages=[
-            {"role": "system", "content": "You are an expert at analyzing educational documents."},
-            {"role": "user", "content": prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
-
-    return response.choices[0].message.content
+    ) as client:
+        return await create_completion(
+            client,
+            model=config["config"]["model"],
+            temperature=config["config"]["temperature"],
+            messages=[
+                system_message(_FG_SYSTEM_PROMPT, config["config"]["model"]),
+                {"role": "user", "content": f"Content:\n{dumps(raw_data)}"}
+            ],
+            response_format={"type": "json_object"}
+        )
 
 
 # System instructions for the Assessment Agent
@@ -226,6 +469,10 @@ You create comprehensive assessment materials that evaluate learner competency a
 - **Components**: Scenario, questions, model answers, learning outcomes covered
 - **Use**: `generate_case_study(fg_data_json, slides_data, model_choice)`
 
+### Batched Generation
+- **Purpose**: Generate several assessment types in one call
+- **Use**: `generate_all_assessments(fg_data_json, slides_data, model_choice, types)`
+
 ## Required Inputs
 
 ### Facilitator Guide Data (fg_data_json)
@@ -261,8 +508,8 @@ Text content from presentation slides for additional context
 ### Multiple Assessment Types
 When user needs multiple assessment types:
 1. Parse FG once and reuse the structured data
-2. Generate each assessment type in sequence
-3. Report completion of each type
+2. Prefer `generate_all_assessments(fg_data_json, slides_data, model_choice, types)` with e.g. `types="SAQ,CS"` - it runs all requested types concurrently
+3. Report completion of each type, including any per-type errors
 
 ## Assessment Quality Standards
 
@@ -349,6 +596,7 @@ assessment_agent = create_agent(
         generate_saq_questions,
         generate_practical_performance,
         generate_case_study,
+        generate_all_assessments,
         parse_facilitator_guide,
         interpret_fg_content,
     ],
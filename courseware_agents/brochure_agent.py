@@ -11,55 +11,119 @@ Date: 26 January 2026
 
 from agents import function_tool
 from courseware_agents.base import create_agent
-from courseware_agents.schemas import BrochureAgentResponse, BrochureContent
-import json
+from courseware_agents.completions import async_client, create_completion, loop_semaphore, system_message
+from courseware_agents.json_utils import dumps, loads
+from courseware_agents.schemas import BrochureAgentResponse, BrochureContent, MarketingContent
+import asyncio
+import os
+import re
+from pathlib import Path
+from typing import Optional
+from pydantic import ValidationError
+from generate_brochure.brochure_generation import web_scrape_course_info
+from settings.model_configs import get_model_config
+
+# Optional PDF backends
+try:
+    from weasyprint import HTML as WeasyHTML
+except (ImportError, OSError):  # OSError: missing Cairo/Pango system libraries
+    WeasyHTML = None
+
+try:
+    from xhtml2pdf import pisa
+except ImportError:
+    pisa = None
+
+# Maximum concurrent PDF renders (CPU-heavy)
+PDF_CONCURRENCY = 2
+
+# Brochure assets directory, used as the base URL for PDF rendering
+_TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "generate_brochure" / "brochure_template"
+
+
+# Static system prompt for generate_marketing_content. Kept separate from
+# the per-call course fields so providers can serve it from their prompt cache.
+_MARKETING_SYSTEM_PROMPT = """You are a marketing copywriter for educational courses.
+
+Create compelling marketing content for a course brochure from the course details provided.
 
+Generate:
+1. An engaging tagline (one sentence)
+2. An enhanced course description (2-3 sentences)
+3. 3-5 key benefits for learners
+4. A call-to-action statement
 
-@function_tool
-def scrape_course_info(url: str) -> str:
-    """
-    Scrape course information from a MySkillsFuture or training provider URL.
+Guidelines:
+- Write for working adults considering a WSQ training course in Singapore
+- Keep the tone professional, clear and encouraging; avoid hype and exaggerated claims
+- Base every statement on the course details provided; do not invent certifications, fees or funding
+- Benefits should be concrete outcomes of the learning outcomes, each a single short sentence
 
-    Args:
-        url: URL of the course page to scrape
+Return as JSON with keys: tagline, enhanced_description, benefits, cta
+- tagline: string
+- enhanced_description: string
+- benefits: list of strings
+- cta: string"""
 
-    Returns:
-        Extracted course information as JSON string
+# Markdown code fence some models wrap their JSON in
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL | re.IGNORECASE)
+
+
+def _parse_marketing_content(content: str) -> Optional[MarketingContent]:
+    """
+    Leniently parse the model's marketing JSON.
+
+    Strips a surrounding code fence, treats null fields as missing and
+    accepts benefits given as a single string. Returns None if the content
+    still isn't usable.
     """
-    from generate_brochure.brochure_generation import web_scrape_course_info
+    if not content:
+        return None
+    fenced = _CODE_FENCE.match(content)
+    if fenced:
+        content = fenced.group(1)
+    try:
+        data = loads(content)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    data = {key: value for key, value in data.items() if value is not None}
+    benefits = data.get("benefits")
+    if isinstance(benefits, str):
+        data["benefits"] = [benefits] if benefits.strip() else []
+    elif isinstance(benefits, list):
+        data["benefits"] = [str(b) for b in benefits if b is not None]
+
+    try:
+        return MarketingContent.model_validate(data)
+    except ValidationError:
+        return None
+
 
-    course_data = web_scrape_course_info(url)
-    return json.dumps(course_data.to_dict())
+def _scrape_course_info(url: str) -> dict:
+    """Scrape a course page and return the course data as a dict."""
+    return web_scrape_course_info(url).to_dict()
 
 
 @function_tool
-def generate_brochure_html(course_data_json: str) -> str:
+def scrape_course_info(url: str) -> str:
     """
-    Generate brochure HTML from course data.
+    Scrape course information from a MySkillsFuture or training provider URL.
 
     Args:
-        course_data_json: Course information as JSON string
+        url: URL of the course page to scrape
 
     Returns:
-        Generated HTML content
+        Extracted course information as JSON string
     """
-    from pathlib import Path
-    from jinja2 import Template
-
-    course_data = json.loads(course_data_json)
-
-    # Load brochure template
-    template_dir = Path(__file__).resolve().parent.parent / "generate_brochure" / "brochure_template"
-    template_path = template_dir / "brochure_template.html"
-
-    if template_path.exists():
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        template = Template(template_content)
-        return template.render(**course_data)
-    else:
-        # Generate basic HTML if template not found
-        return f"""
+    return dumps(_scrape_course_info(url))
+
+
+def _render_brochure_html(course_data: dict) -> str:
+    """Render basic brochure HTML from a course data dict."""
+    return f"""
         <html>
         <head><title>{course_data.get('course_title', 'Course Brochure')}</title></head>
         <body>
@@ -71,56 +135,80 @@ def generate_brochure_html(course_data_json: str) -> str:
 
 
 @function_tool
-def generate_brochure_pdf(html_content: str, output_path: str) -> str:
+def generate_brochure_html(course_data_json: str) -> str:
     """
-    Generate PDF brochure from HTML content.
+    Generate brochure HTML from course data.
 
     Args:
-        html_content: HTML content to convert
-        output_path: Path to save the PDF
+        course_data_json: Course information as JSON string
 
     Returns:
-        Path to generated PDF file or error message
+        Generated HTML content
     """
-    import os
+    return _render_brochure_html(loads(course_data_json))
+
 
+def _render_pdf_sync(html_content: str, output_path: str) -> str:
+    """Blocking PDF render used by generate_brochure_pdf."""
     os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
 
-    try:
-        from xhtml2pdf import pisa
-        with open(output_path, 'wb') as pdf_file:
-            pisa_status = pisa.CreatePDF(html_content, dest=pdf_file)
-        if pisa_status.err:
-            return f"Error generating PDF: {pisa_status.err}"
-        return output_path
-    except ImportError:
+    # Prefer WeasyPrint (C rendering backends, better CSS support)
+    if WeasyHTML is not None:
+        try:
+            WeasyHTML(string=html_content, base_url=str(_TEMPLATE_DIR)).write_pdf(output_path)
+            return output_path
+        except Exception as e:
+            return f"Error generating PDF: {e}"
+
+    if pisa is None:
         return "PDF generation library not available"
 
+    with open(output_path, 'wb') as pdf_file:
+        pisa_status = pisa.CreatePDF(html_content, dest=pdf_file)
+    if pisa_status.err:
+        return f"Error generating PDF: {pisa_status.err}"
+    return output_path
+
+
+async def _render_pdf(html_content: str, output_path: str) -> str:
+    """Render a PDF in a worker thread, bounded by PDF_CONCURRENCY renders at a time."""
+    async with loop_semaphore("pdf", PDF_CONCURRENCY):
+        return await asyncio.to_thread(_render_pdf_sync, html_content, output_path)
+
 
 @function_tool
-def create_brochure_from_cp(cp_data_json: str) -> str:
+async def generate_brochure_pdf(html_content: str, output_path: str) -> str:
     """
-    Create brochure data from Course Proposal data.
+    Generate PDF brochure from HTML content.
+
+    Rendering runs in a worker thread so the event loop stays free for
+    other tool calls (e.g. marketing content generation).
 
     Args:
-        cp_data_json: Course Proposal JSON data as string
+        html_content: HTML content to convert
+        output_path: Path to save the PDF
 
     Returns:
-        Brochure data as JSON string
+        Path to generated PDF file or error message
     """
-    cp_data = json.loads(cp_data_json)
+    return await _render_pdf(html_content, output_path)
 
+
+def _first(value):
+    """Return the first item of a list value, or the value itself ("" if empty)."""
+    if isinstance(value, list):
+        return value[0] if value else ""
+    return value or ""
+
+
+def _create_brochure_from_cp(cp_data: dict) -> dict:
+    """Map Course Proposal data onto the brochure data structure."""
     course_info = cp_data.get("Course Information", {})
     learning_outcomes = cp_data.get("Learning Outcomes", {})
     tsc_topics = cp_data.get("TSC and Topics", {})
 
-    tsc_title = tsc_topics.get("TSC Title", [""])
-    if isinstance(tsc_title, list):
-        tsc_title = tsc_title[0] if tsc_title else ""
-
-    tsc_code = tsc_topics.get("TSC Code", [""])
-    if isinstance(tsc_code, list):
-        tsc_code = tsc_code[0] if tsc_code else ""
+    tsc_title = _first(tsc_topics.get("TSC Title", ""))
+    tsc_code = _first(tsc_topics.get("TSC Code", ""))
 
     brochure_data = {
         "course_title": course_info.get("Course Title", ""),
@@ -138,18 +226,71 @@ def create_brochure_from_cp(cp_data_json: str) -> str:
         "tgs_reference_no": "",
         "gst_exclusive_price": "",
         "gst_inclusive_price": "",
-        "course_details_topics": [],
+        "course_details_topics": [
+            {"title": topic, "subtopics": []}
+            for topic in tsc_topics.get("Topics", [])
+        ],
         "course_url": ""
     }
 
-    topics = tsc_topics.get("Topics", [])
-    for topic in topics:
-        brochure_data["course_details_topics"].append({
-            "title": topic,
-            "subtopics": []
-        })
+    return brochure_data
+
+
+@function_tool
+def create_brochure_from_cp(cp_data_json: str) -> str:
+    """
+    Create brochure data from Course Proposal data.
+
+    Args:
+        cp_data_json: Course Proposal JSON data as string
+
+    Returns:
+        Brochure data as JSON string
+    """
+    return dumps(_create_brochure_from_cp(loads(cp_data_json)))
+
+
+async def _generate_marketing_content(course_data: dict, model_choice: str) -> dict:
+    """Return a copy of course_data enhanced with AI marketing content."""
+    # Already enhanced (e.g. re-rendering a cached brochure) - skip the LLM call
+    if course_data.get("tagline") and course_data.get("benefits") and course_data.get("cta"):
+        return course_data
+
+    config = get_model_config(model_choice)
+
+    prompt = f"""Course Title: {course_data.get('course_title', '')}
+Current Description: {' '.join(course_data.get('course_description', []))}
+Learning Outcomes: {course_data.get('learning_outcomes', [])}
+Industry: {course_data.get('tsc_framework', '')}"""
+
+    async with async_client(
+        api_key=config["config"]["api_key"],
+        base_url=config["config"]["base_url"]
+    ) as client:
+        content = await create_completion(
+            client,
+            model=config["config"]["model"],
+            temperature=0.7,
+            messages=[
+                system_message(_MARKETING_SYSTEM_PROMPT, config["config"]["model"]),
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            validate=lambda c: _parse_marketing_content(c) is not None
+        )
+
+    marketing = _parse_marketing_content(content)
+    if marketing is None:
+        # Unusable model output - keep the course data as it was
+        return course_data
+
+    enhanced_data = course_data.copy()
+    enhanced_data["tagline"] = marketing.tagline
+    enhanced_data["course_description"] = [marketing.enhanced_description] + enhanced_data.get("course_description", [])
+    enhanced_data["benefits"] = marketing.benefits
+    enhanced_data["cta"] = marketing.cta
 
-    return json.dumps(brochure_data)
+    return enhanced_data
 
 
 @function_tool
@@ -167,51 +308,75 @@ async def generate_marketing_content(
     Returns:
         Enhanced course data with marketing content as JSON string
     """
-    from settings.model_configs import get_model_config
-    from openai import OpenAI
-
-    course_data = json.loads(course_data_json)
-    config = get_model_config(model_choice)
-
-    client = OpenAI(
-        api_key=config["config"]["api_key"],
-        base_url=config["config"]["base_url"]
-    )
-
-    prompt = f"""Create compelling marketing content for this course brochure:
+    course_data = loads(course_data_json)
+    enhanced_data = await _generate_marketing_content(course_data, model_choice)
+    if enhanced_data is course_data:
+        return course_data_json
+    return dumps(enhanced_data)
 
-Course Title: {course_data.get('course_title', '')}
-Current Description: {' '.join(course_data.get('course_description', []))}
-Learning Outcomes: {course_data.get('learning_outcomes', [])}
-Industry: {course_data.get('tsc_framework', '')}
 
-Generate:
-1. An engaging tagline (one sentence)
-2. An enhanced course description (2-3 sentences)
-3. 3-5 key benefits for learners
-4. A call-to-action statement
+@function_tool
+async def generate_brochure_pipeline(
+    url: str = "",
+    cp_data_json: str = "",
+    output_pdf_path: str = "",
+    enhance: bool = True,
+    model_choice: str = "GPT-4o-Mini"
+) -> str:
+    """
+    Run the full brochure workflow (data -> marketing -> HTML -> PDF) in one call.
 
-Return as JSON with keys: tagline, enhanced_description, benefits, cta"""
+    When both a URL and CP data are given, scraping runs in a worker thread
+    while the CP data is transformed; scraped values take precedence and CP
+    data fills the gaps.
 
-    response = client.chat.completions.create(
-        model=config["config"]["model"],
-        temperature=0.7,
-        messages=[
-            {"role": "system", "content": "You are a marketing copywriter for educational courses."},
-            {"role": "user", "content": prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
+    Args:
+        url: Optional URL of the course page to scrape
+        cp_data_json: Optional Course Proposal JSON data as string
+        output_pdf_path: Optional path to save the PDF (HTML only if empty)
+        enhance: Whether to add AI-generated marketing content
+        model_choice: Model to use for marketing content generation
 
-    marketing = json.loads(response.choices[0].message.content)
+    Returns:
+        JSON string with course_data, html and pdf_path ("partial" status
+        with pdf_error if the HTML was built but the PDF could not be rendered)
+    """
+    if not url and not cp_data_json:
+        return dumps({"status": "error", "message": "Provide a course URL or CP data"})
+
+    # Start scraping in a worker thread and transform CP data while it runs
+    scrape_task = asyncio.create_task(asyncio.to_thread(_scrape_course_info, url)) if url else None
+    course_data = _create_brochure_from_cp(loads(cp_data_json)) if cp_data_json else {}
+
+    if scrape_task is not None:
+        scraped = await scrape_task
+        for key, value in course_data.items():
+            if not scraped.get(key):
+                scraped[key] = value
+        course_data = scraped
+
+    if enhance:
+        course_data = await _generate_marketing_content(course_data, model_choice)
+
+    html = _render_brochure_html(course_data)
+
+    response = {
+        "status": "success",
+        "course_data": course_data,
+        "html": html,
+        "pdf_path": ""
+    }
 
-    enhanced_data = course_data.copy()
-    enhanced_data["tagline"] = marketing.get("tagline", "")
-    enhanced_data["course_description"] = [marketing.get("enhanced_description", "")] + enhanced_data.get("course_description", [])
-    enhanced_data["benefits"] = marketing.get("benefits", [])
-    enhanced_data["cta"] = marketing.get("cta", "")
+    if output_pdf_path:
+        # _render_pdf returns the output path on success, otherwise an error message
+        rendered = await _render_pdf(html, output_pdf_path)
+        if rendered == output_pdf_path:
+            response["pdf_path"] = rendered
+        else:
+            response["status"] = "partial"
+            response["pdf_error"] = rendered
 
-    return json.dumps(enhanced_data)
+    return dumps(response)
 
 
 # System instructions for the Brochure Agent
@@ -247,6 +412,12 @@ You create compelling, professional course marketing materials. You can work fro
 - **Tool**: `generate_brochure_pdf(html_content, output_path)`
 - **Purpose**: Convert HTML brochure to PDF
 - **Returns**: Path to generated PDF file
+- **Note**: Rendering runs off the event loop, so PDF conversion can be requested concurrently with other tool calls such as `generate_marketing_content`
+
+### 6. Full Pipeline
+- **Tool**: `generate_brochure_pipeline(url, cp_data_json, output_pdf_path, enhance, model_choice)`
+- **Purpose**: Run data gathering, marketing enhancement, HTML and PDF generation in a single call
+- **Returns**: JSON with course data, HTML content and PDF path; status is "partial" with a `pdf_error` message if PDF rendering failed
 
 ## Data Sources
 
@@ -285,6 +456,7 @@ Use when user provides:
 3. Optionally convert to PDF
 
 ### Premium Brochure (Full Enhancement)
+Prefer `generate_brochure_pipeline(...)` with `enhance=True` and an `output_pdf_path` - it performs all of these steps in one call:
 1. Get course data
 2. Generate AI marketing content
 3. Generate HTML
@@ -359,7 +531,7 @@ Do you have course data or a URL to start from?"
 - Print-ready format
 - Consistent rendering
 - Easy to share/distribute
-- Requires `xhtml2pdf` library
+- Requires `weasyprint` (preferred) or `xhtml2pdf` library
 
 ## Error Handling
 
@@ -379,7 +551,7 @@ Do you have course data or a URL to start from?"
 
 - **Data Format**: All inputs/outputs are JSON strings
 - **Marketing Content**: Optional but significantly improves quality
-- **PDF Dependency**: Requires `xhtml2pdf` library for PDF generation
+- **PDF Dependency**: Uses `weasyprint` when installed, otherwise `xhtml2pdf`
 - **Model Selection**: Marketing content generation uses configurable models
 - **Template**: Uses professional brochure template from `generate_brochure/brochure_template/`
 """
@@ -394,6 +566,7 @@ brochure_agent = create_agent(
         generate_brochure_pdf,
         create_brochure_from_cp,
         generate_marketing_content,
+        generate_brochure_pipeline,
     ],
     model_name="GPT-4o-Mini",
     handoff_description="Specialized agent for creating course marketing brochures"
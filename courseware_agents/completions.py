@@ -0,0 +1,262 @@
+"""
+Chat Completion Helpers
+
+Shared plumbing for agent tools that call chat completions directly
+(rather than through the agents runtime). Provides:
+- AsyncOpenAI clients with shared connection pool limits, scoped to the caller
+- An in-process LRU response cache keyed on the full prompt, so identical
+  re-invocations from the agent skip the API round-trip
+- System messages marked for provider-side prompt caching
+- Per-event-loop semaphores bounding concurrent outbound calls
+- Retry with exponential backoff for transient API failures
+
+Author: Courseware Generator Team
+Date: 26 January 2026
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of cached completions kept in memory
+RESPONSE_CACHE_SIZE = 1024
+
+# Connection pool limits for async clients
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 32
+
+# Maximum concurrent outbound LLM calls (keeps batched fan-out under provider rate limits)
+LLM_CONCURRENCY = int(os.getenv("COURSEWARE_LLM_CONCURRENCY", "8"))
+
+# Retry settings for transient API failures (rate limits, 5xx, connection errors)
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.4
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Semaphores per event loop. A contended semaphore references its loop, so a
+# weak-keyed map would never evict; entries for closed loops are pruned instead
+_semaphores: Dict[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]] = {}
+_semaphores_lock = threading.Lock()
+
+_response_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+
+def async_client(api_key: str, base_url: str) -> AsyncOpenAI:
+    """
+    Create an AsyncOpenAI client for the given credentials.
+
+    Use it as an async context manager so the client and its connection
+    pool are closed when the caller is done; clients are bound to the event
+    loop they are used on, and Streamlit creates a fresh loop per
+    asyncio.run call, so they are not cached across calls.
+
+    Args:
+        api_key: API key for the provider
+        base_url: Base URL of the OpenAI-compatible endpoint
+
+    Returns:
+        New AsyncOpenAI client
+    """
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            )
+        ),
+    )
+
+
+def loop_semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    """
+    Get a named semaphore for the running event loop.
+
+    Semaphores are bound to an event loop, so one is kept per loop and name.
+
+    Args:
+        name: Identifier of the resource being limited (e.g. "llm", "pdf")
+        limit: Maximum concurrent holders, used when the semaphore is created
+
+    Returns:
+        asyncio.Semaphore shared by all callers on the current loop
+    """
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        loop_semaphores = _semaphores.get(loop)
+        if loop_semaphores is None:
+            # First use on this loop: drop semaphores of loops that have finished
+            for closed in [l for l in _semaphores if l.is_closed()]:
+                del _semaphores[closed]
+            loop_semaphores = _semaphores[loop] = {}
+        semaphore = loop_semaphores.get(name)
+        if semaphore is None:
+            semaphore = loop_semaphores[name] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+def llm_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore bounding concurrent LLM calls on the running loop."""
+    return loop_semaphore("llm", LLM_CONCURRENCY)
+
+
+async def retry_with_backoff(
+    coro_factory: Callable[[], Awaitable[T]],
+    max_retries: int = MAX_RETRIES,
+    base_delay: float = RETRY_BASE_DELAY,
+    retry_if: Optional[Callable[[T], bool]] = None,
+) -> T:
+    """
+    Await coro_factory(), retrying transient API failures with exponential backoff.
+
+    Args:
+        coro_factory: Zero-argument callable returning a fresh awaitable per attempt
+        max_retries: Total number of attempts
+        base_delay: Delay before the first retry in seconds (doubles each attempt, plus jitter)
+        retry_if: Optional check on each result; attempts it returns True for
+            are retried too (for callees that catch their own errors and
+            signal failure through their result)
+
+    Returns:
+        Result of the first successful attempt (the last result if retry_if
+        rejected every attempt)
+    """
+    for attempt in range(max_retries):
+        try:
+            result = await coro_factory()
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries - 1:
+                raise
+            reason = f"Transient API error ({type(e).__name__})"
+        else:
+            if retry_if is None or not retry_if(result) or attempt == max_retries - 1:
+                return result
+            reason = "Unusable result"
+        delay = base_delay * (2 ** attempt) + random.random() * 0.1
+        logger.warning("%s, retrying in %.1fs... (attempt %d/%d)", reason, delay, attempt + 1, max_retries)
+        await asyncio.sleep(delay)
+
+
+def system_message(content: str, model: str) -> Dict[str, Any]:
+    """
+    Build a system message, marking it cacheable for models that need it.
+
+    OpenAI, DeepSeek and Gemini cache long shared prompt prefixes
+    automatically; Anthropic models (via OpenRouter) only cache blocks
+    tagged with cache_control.
+
+    Args:
+        content: Static system prompt
+        model: Model ID the message will be sent to
+
+    Returns:
+        Chat message dict
+    """
+    if model.startswith("anthropic/") or "claude" in model.lower():
+        return {
+            "role": "system",
+            "content": [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}],
+        }
+    return {"role": "system", "content": content}
+
+
+def _cache_key(
+    base_url: str,
+    model: str,
+    temperature: float,
+    messages: List[Dict[str, Any]],
+    response_format: Optional[Dict[str, Any]],
+) -> bytes:
+    """Build a compact digest identifying a completion request."""
+    payload = json.dumps(
+        [base_url, model, temperature, messages, response_format],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+def _cache_get(key: bytes) -> Optional[str]:
+    with _response_cache_lock:
+        content = _response_cache.get(key)
+        if content is not None:
+            _response_cache.move_to_end(key)
+        return content
+
+
+def _cache_put(key: bytes, content: str) -> None:
+    with _response_cache_lock:
+        _response_cache[key] = content
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def clear_response_cache() -> None:
+    """Drop all cached completions."""
+    with _response_cache_lock:
+        _response_cache.clear()
+
+
+async def create_completion(
+    client,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float = 0.2,
+    response_format: Optional[Dict[str, Any]] = None,
+    validate: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """
+    Create a chat completion and return its message content, using the response cache.
+
+    Args:
+        client: AsyncOpenAI-compatible client
+        model: Model ID to call
+        messages: Chat messages
+        temperature: Sampling temperature
+        response_format: Optional response format (e.g. {"type": "json_object"})
+        validate: Optional check on the content; content it rejects is
+            returned but not cached, so the next call asks the model again
+
+    Returns:
+        Content of the first choice's message
+    """
+    key = _cache_key(str(client.base_url), model, temperature, messages, response_format)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    kwargs = {"model": model, "temperature": temperature, "messages": messages}
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+
+    async def _create():
+        async with llm_semaphore():
+            return await client.chat.completions.create(**kwargs)
+
+    response = await retry_with_backoff(_create)
+    content = response.choices[0].message.content
+
+    if content and (validate is None or validate(content)):
+        _cache_put(key, content)
+    return content
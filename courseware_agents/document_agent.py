@@ -16,55 +16,231 @@ from courseware_agents.schemas import (
     DocumentVerification,
     ExtractedEntity,
 )
-import json
+from courseware_agents.json_utils import dumps, loads
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import time
 
+# Maximum PDF pages sent for entity extraction concurrently
+PAGE_EXTRACTION_WORKERS = 8
 
-@function_tool
-def extract_document_entities(
-    file_path: str,
-    custom_instructions: str = "Extract the name of the person, company, UEN, masked NRIC, and document date."
-) -> str:
+# Longest edge (px) of images sent to the vision model
+VISION_MAX_EDGE = 1024
+
+# Entity types a complete supporting document must contain
+REQUIRED_FIELDS = ("PERSON", "COMPANY NAME", "DOCUMENT DATE")
+
+# Image types sent to the vision model directly, by file extension
+_IMAGE_MIME_TYPES = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg"}
+
+# Seconds a fetched copy of the training records sheet is reused
+SHEET_CACHE_TTL = 300
+
+# ACRA lookups kept per UEN, and for how long (company records rarely change)
+UEN_CACHE_SIZE = 10_000
+UEN_CACHE_TTL = 86_400
+
+_uen_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+# Training records sheet columns used for matching
+_NAME_COLUMN = "Trainee Name (as on government ID)"
+_UEN_COLUMN = "Employer UEN (mandatory if sponsorship type = employer)"
+
+# Number of extraction results kept, keyed by (file content digest, instructions)
+EXTRACTION_CACHE_SIZE = 256
+
+_extraction_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+
+_sheet_cache = {"data": None, "ts": 0.0, "index": None}
+
+
+def _normalize(value) -> str:
+    """Normalize a field the same way find_best_match does before comparing."""
+    return str(value).lower().strip()
+
+
+def _build_match_index(sheet_data: list) -> dict:
     """
-    Extract named entities from a document using AI.
+    Index sheet rows for exact lookups.
 
-    Args:
-        file_path: Path to the document (PDF or image)
-        custom_instructions: Custom extraction instructions
+    "pair" is keyed by (name, uen) and "name" by name alone; the first row
+    wins for duplicates, matching find_best_match's tie-breaking.
+    """
+    index = {"pair": {}, "name": {}}
+    for row in sheet_data:
+        name = _normalize(row.get(_NAME_COLUMN, ""))
+        uen = _normalize(row.get(_UEN_COLUMN, ""))
+        index["pair"].setdefault((name, uen), row)
+        index["name"].setdefault(name, row)
+    return index
+
+
+def _cached_sheet_data() -> list:
+    """Return training records, re-fetching the Google Sheet at most once per SHEET_CACHE_TTL."""
+    from check_documents.sup_doc import get_google_sheet_data
+
+    now = time.monotonic()
+    if _sheet_cache["data"] is None or now - _sheet_cache["ts"] > SHEET_CACHE_TTL:
+        data = get_google_sheet_data()
+        if not data:
+            # Don't cache failed or empty loads
+            return data
+        _sheet_cache["data"] = data
+        _sheet_cache["index"] = _build_match_index(data)
+        _sheet_cache["ts"] = now
+    return _sheet_cache["data"]
+
+
+def _exact_match(fields: dict):
+    """
+    Look up an exact name (and UEN, if extracted) match in the cached sheet index.
+
+    An exact hit scores 100 under find_best_match, so the result is the same
+    as the fuzzy scan; returns None on a miss.
+    """
+    index = _sheet_cache["index"]
+    name = _normalize(fields.get("name", ""))
+    if not index or not name:
+        return None
+    uen = _normalize(fields.get("uen", ""))
+    if uen:
+        return index["pair"].get((name, uen))
+    return index["name"].get(name)
+
+
+def invalidate_sheet_cache() -> None:
+    """Force the next verification to re-fetch the training records sheet."""
+    _sheet_cache["data"] = None
+    _sheet_cache["index"] = None
+    _sheet_cache["ts"] = 0.0
+
+
+def _prepare_vision_image(img, color_required: bool):
+    """
+    Shrink a PIL image for the vision model.
+
+    Text documents read fine in grayscale and at VISION_MAX_EDGE pixels,
+    which cuts upload size several times over; pass color_required=True
+    where colour matters (e.g. stamps) to keep the RGB channels.
+    """
+    from PIL import Image
+
+    if not color_required and img.mode != "L":
+        img = img.convert("L")
+    if max(img.size) > VISION_MAX_EDGE:
+        img.thumbnail((VISION_MAX_EDGE, VISION_MAX_EDGE), Image.LANCZOS)  # in place
+    return img
+
+
+def _extract_entities_from_bytes(
+    file_bytes: bytes,
+    file_extension: str,
+    custom_instructions: str,
+    color_required: bool = False
+):
+    """
+    Run entity extraction on already-read document bytes.
 
     Returns:
-        Extracted entities as JSON string
+        Tuple of (entities dict, whether every extraction call succeeded)
     """
     from check_documents.gemini_processor import extract_entities
-    from PIL import Image
-    import io
 
+    if file_extension in _IMAGE_MIME_TYPES:
+        from PIL import Image
+        import io
+
+        mime_type = _IMAGE_MIME_TYPES[file_extension]
+        img = Image.open(io.BytesIO(file_bytes))  # lazy: reads the header only
+
+        # Send the encoded file as-is unless it needs shrinking
+        if not color_required or max(img.size) > VISION_MAX_EDGE:
+            img = _prepare_vision_image(img, color_required)
+            if mime_type == "image/jpeg" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG" if mime_type == "image/jpeg" else "PNG")
+            file_bytes = buffer.getvalue()
+
+        result = extract_entities(file_bytes, custom_instructions, is_image=True, mime_type=mime_type)
+        return result, "error" not in result
+
+    from check_documents.sup_doc import convert_pdf_to_images
+
+    images = convert_pdf_to_images(file_bytes)
+    all_entities = {"entities": []}
+    if not images:
+        return all_entities, False
+
+    # Each page is an independent API round-trip, so run them concurrently.
+    # map yields in page order; merge each page as it arrives so per-page
+    # results are released instead of being held until the end.
+    succeeded = True
+    with ThreadPoolExecutor(max_workers=min(PAGE_EXTRACTION_WORKERS, len(images))) as executor:
+        for result in executor.map(
+            lambda img: extract_entities(_prepare_vision_image(img, color_required), custom_instructions, is_image=True),
+            images
+        ):
+            if "error" in result:
+                succeeded = False
+            if "entities" in result:
+                all_entities["entities"].extend(result["entities"])
+
+    return all_entities, succeeded
+
+
+def _extract_document_entities_obj(file_path: str, custom_instructions: str, color_required: bool = False) -> dict:
+    """
+    Extract named entities from a document, returning the result as a dict.
+
+    Results are cached by file content and instructions, so re-checking the
+    same document (e.g. verification followed by a completeness check)
+    doesn't repeat the vision model calls. Callers must not mutate the result.
+    """
     file_extension = file_path.split(".")[-1].lower()
 
-    if file_extension in ["png", "jpg", "jpeg"]:
-        with open(file_path, "rb") as f:
-            image_bytes = f.read()
-        img = Image.open(io.BytesIO(image_bytes))
-        result = extract_entities(img, custom_instructions, is_image=True)
-        return json.dumps(result)
+    if file_extension not in _IMAGE_MIME_TYPES and file_extension != "pdf":
+        return {"error": f"Unsupported file type: {file_extension}", "entities": []}
 
-    elif file_extension == "pdf":
-        from check_documents.sup_doc import convert_pdf_to_images
+    with open(file_path, "rb") as f:
+        file_bytes = f.read()
 
-        with open(file_path, "rb") as f:
-            pdf_bytes = f.read()
+    cache_key = (hashlib.blake2b(file_bytes, digest_size=16).digest(), custom_instructions, color_required)
+    cached = _extraction_cache.get(cache_key)
+    if cached is not None:
+        _extraction_cache.move_to_end(cache_key)
+        return cached
 
-        images = convert_pdf_to_images(pdf_bytes)
-        all_entities = {"entities": []}
+    entities, succeeded = _extract_entities_from_bytes(file_bytes, file_extension, custom_instructions, color_required)
 
-        for img in images:
-            result = extract_entities(img, custom_instructions, is_image=True)
-            if "entities" in result:
-                all_entities["entities"].extend(result["entities"])
+    # Only cache complete results so transient API failures are retried
+    if succeeded:
+        _extraction_cache[cache_key] = entities
+        while len(_extraction_cache) > EXTRACTION_CACHE_SIZE:
+            _extraction_cache.popitem(last=False)
+    return entities
 
-        return json.dumps(all_entities)
 
-    else:
-        return json.dumps({"error": f"Unsupported file type: {file_extension}", "entities": []})
+@function_tool
+def extract_document_entities(
+    file_path: str,
+    custom_instructions: str = "Extract the name of the person, company, UEN, masked NRIC, and document date.",
+    color_required: bool = False
+) -> str:
+    """
+    Extract named entities from a document using AI.
+
+    Args:
+        file_path: Path to the document (PDF or image)
+        custom_instructions: Custom extraction instructions
+        color_required: Keep colour in the images sent to the model (e.g. when stamp colours matter);
+            by default pages are sent as downscaled grayscale
+
+    Returns:
+        Extracted entities as JSON string
+    """
+    return dumps(_extract_document_entities_obj(file_path, custom_instructions, color_required))
 
 
 @function_tool
@@ -83,16 +259,15 @@ def verify_against_training_records(
         Verification results as JSON string
     """
     from check_documents.sup_doc import (
-        get_google_sheet_data,
         get_extracted_fields,
         find_best_match
     )
 
-    extracted_entities = json.loads(extracted_entities_json)
-    sheet_data = get_google_sheet_data()
+    extracted_entities = loads(extracted_entities_json)
+    sheet_data = _cached_sheet_data()
 
     if not sheet_data:
-        return json.dumps({
+        return dumps({
             "status": "error",
             "message": "Could not load training records"
         })
@@ -101,7 +276,12 @@ def verify_against_training_records(
 
     results = []
     for fields in extracted_fields_list:
-        match, score = find_best_match(fields, sheet_data, threshold)
+        match = _exact_match(fields)
+        if match is not None:
+            score = 100.0
+        else:
+            # Fall back to the fuzzy scan over all rows
+            match, score = find_best_match(fields, sheet_data, threshold)
 
         result = {
             "extracted_name": fields.get("name", ""),
@@ -119,7 +299,7 @@ def verify_against_training_records(
 
         results.append(result)
 
-    return json.dumps({
+    return dumps({
         "status": "success",
         "verification_results": results,
         "total_records_checked": len(sheet_data)
@@ -127,31 +307,48 @@ def verify_against_training_records(
 
 
 @function_tool
-def verify_company_uen(uen: str) -> str:
+async def verify_company_uen(uen: str) -> str:
     """
     Verify a company UEN against ACRA database.
 
+    The lookup is awaited on an async HTTP client, so concurrent
+    verifications don't block the agent's event loop.
+
     Args:
         uen: The UEN to verify
 
     Returns:
         ACRA verification results as JSON string
     """
-    from check_documents.acra_call import search_dataset_by_query
-
-    try:
-        result = search_dataset_by_query(uen)
-        return json.dumps({
-            "status": "success",
-            "uen": uen,
-            "verification": result
-        })
-    except Exception as e:
-        return json.dumps({
-            "status": "error",
-            "uen": uen,
-            "message": str(e)
-        })
+    from check_documents.acra_call import search_dataset_by_query_async
+
+    cache_key = uen.strip().upper()
+    cached = _uen_cache.get(cache_key)
+    if cached is not None and time.monotonic() - cached[0] <= UEN_CACHE_TTL:
+        _uen_cache.move_to_end(cache_key)
+        result = cached[1]
+    else:
+        try:
+            result = await search_dataset_by_query_async(uen)
+        except Exception as e:
+            return dumps({
+                "status": "error",
+                "uen": uen,
+                "message": str(e)
+            })
+
+        # Only cache found records; an empty result may be a transient API failure
+        if result:
+            _uen_cache[cache_key] = (time.monotonic(), result)
+            _uen_cache.move_to_end(cache_key)
+            while len(_uen_cache) > UEN_CACHE_SIZE:
+                _uen_cache.popitem(last=False)
+
+    return dumps({
+        "status": "success",
+        "uen": uen,
+        "verification": result
+    })
 
 
 @function_tool
@@ -165,26 +362,22 @@ def check_document_completeness(file_path: str) -> str:
     Returns:
         Completeness check results as JSON string
     """
-    entities_json = extract_document_entities(
+    entities = _extract_document_entities_obj(
         file_path,
         "Extract all key information: names, dates, company details, UEN, amounts, and any reference numbers."
     )
-    entities = json.loads(entities_json)
-
-    required_fields = ["PERSON", "COMPANY NAME", "DOCUMENT DATE"]
-    found_fields = set()
-
-    for entity in entities.get("entities", []):
-        entity_type = entity.get("type", "").upper()
-        for required in required_fields:
-            if required in entity_type:
-                found_fields.add(required)
 
-    missing = [f for f in required_fields if f not in found_fields]
+    # Entity types repeat across people/pages, so match each distinct type once
+    entity_types = {entity.get("type", "").upper() for entity in entities.get("entities", [])}
+    found_fields = [
+        required for required in REQUIRED_FIELDS
+        if any(required in entity_type for entity_type in entity_types)
+    ]
+    missing = [f for f in REQUIRED_FIELDS if f not in found_fields]
 
-    return json.dumps({
+    return dumps({
         "status": "complete" if not missing else "incomplete",
-        "found_fields": list(found_fields),
+        "found_fields": found_fields,
         "missing_fields": missing,
         "all_entities": entities.get("entities", []),
         "recommendation": "Document appears complete" if not missing else f"Missing: {', '.join(missing)}"
@@ -201,8 +394,9 @@ You help verify that supporting documents (employment letters, training records,
 ## Capabilities
 
 ### 1. Entity Extraction
-- **Tool**: `extract_document_entities(file_path, custom_instructions)`
+- **Tool**: `extract_document_entities(file_path, custom_instructions, color_required)`
 - **Purpose**: Extract named entities from documents using AI vision
+- **Images**: Sent as downscaled grayscale by default; set `color_required=True` when colours matter (e.g. company stamps)
 - **Supports**: PDF files, images (PNG, JPG, JPEG)
 - **Extracts**: Person names, company names, UEN, masked NRIC, document dates
 - **Returns**: JSON string with extracted entities
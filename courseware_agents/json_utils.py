@@ -0,0 +1,34 @@
+"""
+JSON Helpers
+
+Fast JSON encoding/decoding for agent tool payloads. Uses orjson when it
+is installed and falls back to the standard library otherwise. Output is
+always compact (no indentation), which also keeps payloads embedded in
+LLM prompts small.
+
+Author: Courseware Generator Team
+Date: 26 January 2026
+"""
+
+from typing import Any
+
+ORJSON_AVAILABLE = False
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+
+
+def dumps(obj: Any) -> str:
+    """Serialize obj to a compact JSON string."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads(data: Any) -> Any:
+    """Deserialize a JSON string (or bytes) to a Python object."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
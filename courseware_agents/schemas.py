@@ -129,6 +129,14 @@ class BrochureContent(BaseModel):
     call_to_action: Optional[str] = None
 
 
+class MarketingContent(BaseModel):
+    """AI-generated marketing copy for a brochure"""
+    tagline: str = ""
+    enhanced_description: str = ""
+    benefits: List[str] = Field(default_factory=list)
+    cta: str = ""
+
+
 class BrochureAgentResponse(BaseModel):
     """Structured response from Brochure Agent"""
     status: str = Field(description="success or error")
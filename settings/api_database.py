@@ -12,9 +12,11 @@ Author: Claude Code
 Date: 26 January 2026
 """
 
+import functools
 import sqlite3
 import os
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, List, Any, Optional, Iterator
 from contextlib import contextmanager
 
 # Database file location
@@ -23,6 +25,24 @@ DB_PATH = "settings/config/api_config.db"
 # Database version for migrations
 DB_VERSION = 2
 
+# One connection per thread, reused across calls (sqlite3 connections
+# must not be shared between threads without external locking)
+_local = threading.local()
+
+# Schema creation, migrations and seeding only need to run once per process
+_initialized = False
+_init_lock = threading.Lock()
+
+# Bumped on every write to llm_models so callers can cache derived model lists
+_models_version = 0
+
+
+@functools.lru_cache(maxsize=1)
+def load_environment() -> None:
+    """Load environment variables from the .env file (once per process)"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
 
 def get_db_path() -> str:
     """Get the database file path, ensuring directory exists"""
@@ -30,23 +50,69 @@ def get_db_path() -> str:
     return DB_PATH
 
 
+def _get_thread_connection() -> sqlite3.Connection:
+    """Get this thread's cached connection, opening and tuning it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(get_db_path())
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        _local.conn = conn
+        _local.depth = 0
+    return conn
+
+
 @contextmanager
 def get_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
+    """
+    Context manager for database connections.
+
+    Reuses a per-thread connection. The outermost block commits on success
+    and rolls back on error; nested blocks share its transaction.
+    """
+    conn = _get_thread_connection()
+    _local.depth += 1
     try:
         yield conn
-        conn.commit()
+        if _local.depth == 1:
+            conn.commit()
     except Exception as e:
-        conn.rollback()
+        if _local.depth == 1:
+            conn.rollback()
         raise e
     finally:
-        conn.close()
+        _local.depth -= 1
+
+
+def get_models_version() -> int:
+    """Get a counter that changes whenever the llm_models table is modified in this process"""
+    return _models_version
+
+
+def _bump_models_version():
+    global _models_version
+    _models_version += 1
 
 
 def init_database():
-    """Initialize the database with required tables"""
+    """Initialize the database with required tables (runs once per process)"""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        # Seeding reads ADMIN_USERNAME/ADMIN_PASSWORD from the environment
+        load_environment()
+        _create_schema()
+        _initialized = True
+
+
+def _create_schema():
+    """Create tables, run migrations and seed built-in data"""
     with get_connection() as conn:
         cursor = conn.cursor()
 
@@ -158,6 +224,25 @@ def init_database():
         # Run migrations for new columns (inside the connection context)
         _run_migrations(conn)
 
+        # Indexes for the model list orderings (name/provider_name lookups
+        # already use the automatic indexes behind their UNIQUE constraints)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_llm_models_builtin_order
+            ON llm_models (is_builtin, sort_order, name)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_llm_models_provider_enabled
+            ON llm_models (api_provider, is_enabled, sort_order, name)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_llm_models_order
+            ON llm_models (sort_order, name)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_llm_models_builtin_name
+            ON llm_models (is_builtin, name)
+        """)
+
     # Seed built-in API key configurations
     _seed_builtin_api_keys()
 
@@ -404,6 +489,8 @@ def _seed_builtin_models():
 
         conn.commit()
 
+    _bump_models_version()
+
 
 def refresh_builtin_models():
     """Refresh built-in models (update existing, add new ones)"""
@@ -431,11 +518,18 @@ def refresh_builtin_models():
 
         conn.commit()
 
+    _bump_models_version()
+
 
 # ============ Model Operations ============
 
-def get_all_models(include_builtin: bool = True) -> List[Dict[str, Any]]:
-    """Get all models from database"""
+def iter_models(include_builtin: bool = True) -> Iterator[sqlite3.Row]:
+    """
+    Iterate over raw model rows (sqlite3.Row, indexable by column name).
+
+    Cheaper than get_all_models() for callers that build their own structures.
+    Rows are fetched up front so the connection isn't held while iterating.
+    """
     init_database()
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -447,28 +541,38 @@ def get_all_models(include_builtin: bool = True) -> List[Dict[str, Any]]:
 
         rows = cursor.fetchall()
 
-        models = []
-        for row in rows:
-            # Handle case where is_enabled column might not exist yet
-            try:
-                is_enabled = bool(row["is_enabled"])
-            except (IndexError, KeyError):
-                is_enabled = True
+    yield from rows
 
-            models.append({
-                "id": row["id"],
-                "name": row["name"],
-                "provider": row["provider"],
-                "config": {
-                    "model": row["model_id"],
-                    "temperature": row["temperature"],
-                    "base_url": row["base_url"]
-                },
-                "api_provider": row["api_provider"],
-                "is_builtin": bool(row["is_builtin"]),
-                "is_enabled": is_enabled
-            })
-        return models
+
+def iter_custom_models() -> Iterator[sqlite3.Row]:
+    """Iterate over raw custom (non-built-in) model rows"""
+    return iter_models(include_builtin=False)
+
+
+def get_all_models(include_builtin: bool = True) -> List[Dict[str, Any]]:
+    """Get all models from database"""
+    models = []
+    for row in iter_models(include_builtin):
+        # Handle case where is_enabled column might not exist yet
+        try:
+            is_enabled = bool(row["is_enabled"])
+        except (IndexError, KeyError):
+            is_enabled = True
+
+        models.append({
+            "id": row["id"],
+            "name": row["name"],
+            "provider": row["provider"],
+            "config": {
+                "model": row["model_id"],
+                "temperature": row["temperature"],
+                "base_url": row["base_url"]
+            },
+            "api_provider": row["api_provider"],
+            "is_builtin": bool(row["is_builtin"]),
+            "is_enabled": is_enabled
+        })
+    return models
 
 
 def get_all_custom_models() -> List[Dict[str, Any]]:
@@ -548,7 +652,8 @@ def add_custom_model(
                 INSERT INTO llm_models (name, provider, model_id, base_url, temperature, api_provider, is_builtin, sort_order)
                 VALUES (?, ?, ?, ?, ?, ?, 0, 999)
             """, (name, provider, model_id, base_url, temperature, api_provider))
-            return True
+        _bump_models_version()
+        return True
     except sqlite3.IntegrityError:
         # Model with this name already exists
         return False
@@ -557,6 +662,59 @@ def add_custom_model(
         return False
 
 
+def add_custom_models_bulk(rows: List[tuple]) -> int:
+    """
+    Add many custom models in a single transaction.
+
+    Each row is (name, provider, model_id, base_url, temperature, api_provider).
+    Names that already exist are skipped. If the batch fails, rows are
+    retried one at a time so a single bad row only skips itself.
+
+    Returns:
+        Number of models inserted
+    """
+    if not rows:
+        return 0
+
+    sql = """
+        INSERT OR IGNORE INTO llm_models (name, provider, model_id, base_url, temperature, api_provider, is_builtin, sort_order)
+        VALUES (?, ?, ?, ?, ?, ?, 0, 999)
+    """
+
+    init_database()
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(sql, rows)
+            inserted = cursor.rowcount
+    except Exception as e:
+        print(f"Error adding custom models in bulk, retrying row by row: {e}")
+        inserted = 0
+        for row in rows:
+            try:
+                with get_connection() as conn:
+                    inserted += conn.execute(sql, row).rowcount
+            except Exception as row_error:
+                print(f"Error adding custom model {row[0]!r}: {row_error}")
+
+    if inserted:
+        _bump_models_version()
+    return inserted
+
+
+# Single statement for update_model; None arguments keep the current value
+_UPDATE_MODEL_SQL = """
+    UPDATE llm_models SET
+        model_id = COALESCE(?, model_id),
+        provider = COALESCE(?, provider),
+        base_url = COALESCE(?, base_url),
+        temperature = COALESCE(?, temperature),
+        api_provider = COALESCE(?, api_provider),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE name = ? AND is_builtin = 0
+"""
+
+
 def update_model(
     name: str,
     model_id: Optional[str] = None,
@@ -566,41 +724,19 @@ def update_model(
     api_provider: Optional[str] = None
 ) -> bool:
     """Update an existing model (custom only)"""
+    if model_id is None and provider is None and base_url is None and temperature is None and api_provider is None:
+        return True  # Nothing to update
+
     init_database()
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-
-            # Build dynamic update query
-            updates = []
-            params = []
-
-            if model_id is not None:
-                updates.append("model_id = ?")
-                params.append(model_id)
-            if provider is not None:
-                updates.append("provider = ?")
-                params.append(provider)
-            if base_url is not None:
-                updates.append("base_url = ?")
-                params.append(base_url)
-            if temperature is not None:
-                updates.append("temperature = ?")
-                params.append(temperature)
-            if api_provider is not None:
-                updates.append("api_provider = ?")
-                params.append(api_provider)
-
-            if not updates:
-                return True  # Nothing to update
-
-            updates.append("updated_at = CURRENT_TIMESTAMP")
-            params.append(name)
-
             # Only update custom models
-            query = f"UPDATE llm_models SET {', '.join(updates)} WHERE name = ? AND is_builtin = 0"
-            cursor.execute(query, params)
-            return cursor.rowcount > 0
+            cursor.execute(_UPDATE_MODEL_SQL, (model_id, provider, base_url, temperature, api_provider, name))
+            updated = cursor.rowcount > 0
+        if updated:
+            _bump_models_version()
+        return updated
     except Exception as e:
         print(f"Error updating model: {e}")
         return False
@@ -618,7 +754,10 @@ def delete_custom_model(name: str) -> bool:
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM llm_models WHERE name = ? AND is_builtin = 0", (name,))
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+        if deleted:
+            _bump_models_version()
+        return deleted
     except Exception as e:
         print(f"Error deleting custom model: {e}")
         return False
@@ -677,28 +816,31 @@ def set_provider_settings(provider_name: str, is_enabled: bool = True, base_url:
 def migrate_from_json(json_models: List[Dict[str, Any]]) -> int:
     """Migrate custom models from JSON format to SQLite"""
     init_database()
-    migrated = 0
 
+    rows = []
     for model in json_models:
+        # Validate each entry up front so one malformed model can't fail the batch
+        if not isinstance(model, dict):
+            continue
         name = model.get("name", "")
         config = model.get("config", {})
 
-        if not name or not config.get("model"):
+        if not name or not isinstance(config, dict) or not config.get("model"):
             continue
 
-        success = add_custom_model(
-            name=name,
-            model_id=config.get("model", ""),
-            provider=model.get("provider", "OpenAIChatCompletionClient"),
-            base_url=config.get("base_url", "https://openrouter.ai/api/v1"),
-            temperature=config.get("temperature", 0.2),
-            api_provider=model.get("api_provider", "OPENROUTER")
-        )
+        try:
+            rows.append((
+                str(name),
+                str(model.get("provider", "OpenAIChatCompletionClient")),
+                str(config.get("model", "")),
+                str(config.get("base_url", "https://openrouter.ai/api/v1")),
+                float(config.get("temperature", 0.2)),
+                str(model.get("api_provider", "OPENROUTER"))
+            ))
+        except (TypeError, ValueError) as e:
+            print(f"Skipping custom model {name!r}: {e}")
 
-        if success:
-            migrated += 1
-
-    return migrated
+    return add_custom_models_bulk(rows)
 
 
 def migrate_from_old_schema():
@@ -726,6 +868,7 @@ def migrate_from_old_schema():
                 cursor.execute("DROP TABLE IF EXISTS custom_models")
                 conn.commit()
                 print("Migrated custom_models to llm_models table")
+                _bump_models_version()
             except Exception as e:
                 print(f"Error during schema migration: {e}")
 
@@ -902,7 +1045,10 @@ def set_model_enabled(model_name: str, enabled: bool) -> bool:
                 UPDATE llm_models SET is_enabled = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE name = ?
             """, (1 if enabled else 0, model_name))
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+        if updated:
+            _bump_models_version()
+        return updated
     except Exception as e:
         print(f"Error setting model enabled status: {e}")
         return False
@@ -1029,6 +1175,12 @@ def delete_task_model_assignment(task_id: str) -> bool:
 # ============ Admin Credentials Operations ============
 
 import hashlib
+import hmac
+
+
+# (username, password_hash) row, cached after the first read; login checks
+# and page renders then skip the database round-trip
+_admin_credentials_cache: Optional[Dict[str, str]] = None
 
 
 def _hash_password(password: str) -> str:
@@ -1061,22 +1213,32 @@ def _seed_admin_credentials():
                     VALUES (?, ?)
                 """, (username, password_hash))
                 conn.commit()
+                _invalidate_admin_credentials_cache()
 
 
 def get_admin_credentials_from_db() -> Optional[Dict[str, str]]:
-    """Get admin credentials from database"""
-    init_database()
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT username, password_hash FROM admin_credentials LIMIT 1")
-        row = cursor.fetchone()
+    """Get admin credentials from database (cached until they are changed)"""
+    global _admin_credentials_cache
+    if _admin_credentials_cache is None:
+        init_database()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT username, password_hash FROM admin_credentials LIMIT 1")
+            row = cursor.fetchone()
 
-        if row:
-            return {
+            if not row:
+                return None
+            _admin_credentials_cache = {
                 "username": row["username"],
                 "password_hash": row["password_hash"]
             }
-        return None
+    return dict(_admin_credentials_cache)
+
+
+def _invalidate_admin_credentials_cache():
+    """Drop the cached admin credentials so the next read hits the database"""
+    global _admin_credentials_cache
+    _admin_credentials_cache = None
 
 
 def set_admin_credentials(username: str, password: str) -> bool:
@@ -1092,7 +1254,8 @@ def set_admin_credentials(username: str, password: str) -> bool:
                 INSERT INTO admin_credentials (username, password_hash)
                 VALUES (?, ?)
             """, (username, password_hash))
-            return True
+        _invalidate_admin_credentials_cache()
+        return True
     except Exception as e:
         print(f"Error setting admin credentials: {e}")
         return False
@@ -1110,17 +1273,15 @@ def verify_admin_password(username: str, password: str) -> bool:
             return False
 
     password_hash = _hash_password(password)
-    return creds["username"] == username and creds["password_hash"] == password_hash
+    # Constant-time comparisons; evaluate both so timing doesn't reveal which one failed
+    username_ok = hmac.compare_digest(creds["username"].encode(), username.encode())
+    password_ok = hmac.compare_digest(creds["password_hash"].encode(), password_hash.encode())
+    return username_ok and password_ok
 
 
 def admin_credentials_exist() -> bool:
     """Check if admin credentials have been set up"""
-    init_database()
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM admin_credentials")
-        count = cursor.fetchone()[0]
-        return count > 0
+    return get_admin_credentials_from_db() is not None
 
 
 # ============ Prompt Templates Operations ============
@@ -9,16 +9,24 @@ Author: Wong Xin Ping
 Updated: 26 January 2026
 """
 
-import streamlit as st
-import json
+from __future__ import annotations
+
+import functools
+import logging
 import os
-from typing import Dict, Any, List
-from dotenv import load_dotenv
+import time
+from typing import Any
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
 
 # Import SQLite database operations
 from settings.api_database import (
-    get_all_models as db_get_all_models,
     get_all_custom_models as db_get_all_custom_models,
+    iter_models as db_iter_models,
+    get_models_version as db_get_models_version,
     get_builtin_models as db_get_builtin_models,
     add_custom_model as db_add_custom_model,
     delete_custom_model as db_delete_custom_model,
@@ -26,6 +34,7 @@ from settings.api_database import (
     migrate_from_json,
     migrate_from_old_schema,
     init_database,
+    load_environment,
     refresh_builtin_models as db_refresh_builtin_models,
     refresh_builtin_api_keys as db_refresh_builtin_api_keys,
     # API key config functions
@@ -34,31 +43,60 @@ from settings.api_database import (
     add_api_key_config as db_add_api_key_config,
     delete_api_key_config as db_delete_api_key_config,
     update_api_key_configured_status as db_update_api_key_configured_status,
-    api_key_config_exists as db_api_key_config_exists
+    api_key_config_exists as db_api_key_config_exists,
+    BUILTIN_API_KEYS,
 )
 
-# Load environment variables from .env file
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Lower-case provider name -> key name for the built-in providers
+_PROVIDER_ENV = {
+    c["key_name"][:-len("_API_KEY")].lower(): c["key_name"] for c in BUILTIN_API_KEYS
+}
 
 # Legacy JSON file paths (for migration)
 LEGACY_CUSTOM_MODELS_FILE = "settings/config/custom_models.json"
 
+# Seconds get_all_available_models() results are reused (also invalidated
+# when API keys or the models table change)
+AVAILABLE_MODELS_CACHE_TTL = 300
+
+_available_models_cache = {"key": None, "models": None, "ts": 0.0}
+
+# Custom models as of the models-table version they were read at
+_custom_models_cache = {"version": None, "models": None}
 
+# Set once the legacy JSON migration has run (or wasn't needed)
+_migration_done = False
+
+# Set once initialize_api_system() has completed in this process
+_system_initialized = False
+
+
+@functools.lru_cache(maxsize=32)
 def _get_secret(key: str, default: str = "") -> str:
-    """Safely get a secret from st.secrets or environment variables"""
+    """Safely get a secret from st.secrets or environment variables (cached; see _clear_secret_cache)"""
+    load_environment()
     # First try environment variables (from .env file)
     env_value = os.environ.get(key, "")
     if env_value:
         return env_value
     # Then try streamlit secrets
     try:
+        import streamlit as st
         return st.secrets.get(key, default)
     except Exception:
         return default
 
 
-def load_api_keys() -> Dict[str, str]:
-    """Load all API keys from secrets.toml or environment variables based on database config"""
+def _clear_secret_cache() -> None:
+    """Force the next _get_secret() calls to re-read env/secrets"""
+    _get_secret.cache_clear()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_api_keys_uncached() -> dict[str, str]:
+    """Read every configured API key from secrets/env (cached; see clear_api_key_cache)"""
     # Initialize database to ensure api_keys table exists
     init_database()
 
@@ -75,18 +113,31 @@ def load_api_keys() -> Dict[str, str]:
         # Update configured status in database
         db_update_api_key_configured_status(key_name, bool(key_value))
 
-    # Cache in session state for performance
-    st.session_state['api_keys'] = api_keys
     return api_keys
 
 
-def save_api_keys(keys: Dict[str, str]) -> bool:
+def load_api_keys() -> dict[str, str]:
+    """Load all API keys from secrets.toml or environment variables based on database config"""
+    # Copy so callers can't modify the cached dict
+    return dict(_load_api_keys_uncached())
+
+
+def clear_api_key_cache() -> None:
+    """Force the next load_api_keys() to re-read secrets/env (call after keys change)"""
+    _clear_secret_cache()
+    _load_api_keys_uncached.cache_clear()
+
+
+def save_api_keys(keys: dict[str, str]) -> bool:
     """
     Save API keys to session state.
     Note: Actual persistence should be done by editing .streamlit/secrets.toml
     """
+    import streamlit as st
+
     try:
         st.session_state['api_keys'] = keys
+        clear_api_key_cache()
         return True
     except Exception as e:
         st.error(f"Error saving API keys: {e}")
@@ -96,12 +147,14 @@ def save_api_keys(keys: Dict[str, str]) -> bool:
 def get_api_key(provider: str) -> str:
     """Get API key for specific provider"""
     keys = load_api_keys()
-    key_name = f"{provider.upper()}_API_KEY"
+    key_name = _PROVIDER_ENV.get(provider.lower()) or f"{provider.upper()}_API_KEY"
     return keys.get(key_name, "")
 
 
 def delete_api_key(key_name: str) -> bool:
     """Clear an API key from session state"""
+    import streamlit as st
+
     try:
         keys = load_api_keys()
         if key_name in keys:
@@ -115,47 +168,71 @@ def delete_api_key(key_name: str) -> bool:
 
 def _migrate_json_to_sqlite():
     """Migrate custom models from JSON to SQLite (one-time migration)"""
+    global _migration_done
+    # Checked at most once per process once it has succeeded (or there was nothing to do)
+    if _migration_done:
+        return
+
     if os.path.exists(LEGACY_CUSTOM_MODELS_FILE):
         try:
-            with open(LEGACY_CUSTOM_MODELS_FILE, 'r') as f:
-                json_models = json.load(f)
+            with open(LEGACY_CUSTOM_MODELS_FILE, 'rb') as f:
+                json_models = _json.loads(f.read())
 
             if json_models:
                 migrated = migrate_from_json(json_models)
                 if migrated > 0:
-                    print(f"Migrated {migrated} custom models from JSON to SQLite")
+                    logger.info("Migrated %d custom models from JSON to SQLite", migrated)
+
+                # Keep the JSON until every importable model is in the database
+                missing = [
+                    m["name"] for m in json_models
+                    if isinstance(m, dict) and m.get("name")
+                    and isinstance(m.get("config"), dict) and m["config"].get("model")
+                    and not db_model_exists(m["name"])
+                ]
+                if missing:
+                    logger.error("Custom models not migrated, keeping %s: %s",
+                                 LEGACY_CUSTOM_MODELS_FILE, ", ".join(map(str, missing)))
+                    return  # retry on the next call
 
                 # Rename old file to indicate migration complete
                 backup_file = LEGACY_CUSTOM_MODELS_FILE + ".migrated"
                 os.rename(LEGACY_CUSTOM_MODELS_FILE, backup_file)
-                print(f"Renamed {LEGACY_CUSTOM_MODELS_FILE} to {backup_file}")
+                logger.info("Renamed %s to %s", LEGACY_CUSTOM_MODELS_FILE, backup_file)
         except Exception as e:
-            print(f"Error during migration: {e}")
+            logger.error("Error during migration: %s", e)
+            return  # retry on the next call
+
+    _migration_done = True
 
 
-def load_custom_models() -> List[Dict[str, Any]]:
+def load_custom_models() -> list[dict[str, Any]]:
     """Load custom (non-built-in) LLM models from SQLite database"""
     # Check for and perform migration if needed
     _migrate_json_to_sqlite()
 
-    # Load from SQLite
-    models = db_get_all_custom_models()
-
-    # Cache in session state
-    st.session_state['custom_models'] = models
+    # Reuse the last read until the models table changes
+    version = db_get_models_version()
+    if _custom_models_cache["version"] == version:
+        models = list(_custom_models_cache["models"])
+    else:
+        models = db_get_all_custom_models()
+        _custom_models_cache.update(version=version, models=list(models))
     return models
 
 
-def load_builtin_models() -> List[Dict[str, Any]]:
+def load_builtin_models() -> list[dict[str, Any]]:
     """Load built-in LLM models from SQLite database"""
     return db_get_builtin_models()
 
 
-def save_custom_models(models: List[Dict[str, Any]]) -> bool:
+def save_custom_models(models: list[dict[str, Any]]) -> bool:
     """
     Save custom models - now handled by individual add/remove operations.
     This function is kept for backward compatibility.
     """
+    import streamlit as st
+
     st.session_state['custom_models'] = models
     return True
 
@@ -170,6 +247,8 @@ def add_custom_model(
     custom_api_key: str = ""
 ) -> bool:
     """Add a new custom model to SQLite database"""
+    import streamlit as st
+
     # Check if model already exists
     if db_model_exists(name):
         st.error(f"Model Display Name '{name}' already exists!")
@@ -185,65 +264,71 @@ def add_custom_model(
         temperature=temperature,
         api_provider=api_provider if api_provider else "OPENROUTER"
     )
-
-    if success:
-        # Clear session state cache to force reload
-        if 'custom_models' in st.session_state:
-            del st.session_state['custom_models']
-        if 'all_models' in st.session_state:
-            del st.session_state['all_models']
-
+    # The models version bump on write invalidates load_custom_models()
     return success
 
 
 def remove_custom_model(name: str) -> bool:
     """Remove a custom model from SQLite database"""
-    success = db_delete_custom_model(name)
+    # The models version bump on write invalidates load_custom_models()
+    return db_delete_custom_model(name)
 
-    if success:
-        # Clear session state cache to force reload
-        if 'custom_models' in st.session_state:
-            del st.session_state['custom_models']
-        if 'all_models' in st.session_state:
-            del st.session_state['all_models']
-
-    return success
 
-
-def get_all_available_models() -> Dict[str, Dict[str, Any]]:
+def get_all_available_models() -> dict[str, dict[str, Any]]:
     """Get all available models (built-in + custom) with current API keys from SQLite"""
     # Get current API keys
     current_keys = load_api_keys()
 
-    # Get all models from SQLite database
-    all_models = db_get_all_models(include_builtin=True)
-
+    # Reuse the last result while the keys and models are unchanged
+    cache_key = (tuple(sorted(current_keys.items())), db_get_models_version())
+    now = time.monotonic()
+    if (_available_models_cache["key"] == cache_key
+            and now - _available_models_cache["ts"] <= AVAILABLE_MODELS_CACHE_TTL):
+        return dict(_available_models_cache["models"])
+
+    # Key values by api_provider (OPENROUTER_API_KEY -> OPENROUTER), built once per call
+    suffix = "_API_KEY"
+    key_by_provider = {
+        name[:-len(suffix)]: value
+        for name, value in current_keys.items()
+        if name.endswith(suffix)
+    }
+
+    # Build configs straight from the SQLite rows (no intermediate model dicts)
     updated_models = {}
-    for model in all_models:
+    for row in db_iter_models(include_builtin=True):
         # Resolve API key based on api_provider
-        api_provider = model.get("api_provider", "OPENROUTER")
-        resolved_key = current_keys.get(f"{api_provider}_API_KEY", "")
+        api_provider = row["api_provider"]
+        resolved_key = key_by_provider.get(api_provider, "")
 
         # Create model config with resolved API key
         model_with_key = {
-            "name": model["name"],
-            "provider": model["provider"],
+            "name": row["name"],
+            "provider": row["provider"],
             "config": {
-                "model": model["config"]["model"],
-                "temperature": model["config"]["temperature"],
-                "base_url": model["config"].get("base_url", "https://openrouter.ai/api/v1"),
+                "model": row["model_id"],
+                "temperature": row["temperature"],
+                "base_url": row["base_url"],
                 "api_key": resolved_key
             },
             "api_provider": api_provider,
-            "is_builtin": model.get("is_builtin", False)
+            "is_builtin": bool(row["is_builtin"])
         }
-        updated_models[model["name"]] = model_with_key
+        updated_models[row["name"]] = model_with_key
 
-    return updated_models
+    _available_models_cache.update(key=cache_key, models=updated_models, ts=now)
+    return dict(updated_models)
 
 
 def initialize_api_system():
-    """Initialize the API system on app startup"""
+    """Initialize the API system on app startup (once per process)"""
+    global _system_initialized
+    if _system_initialized:
+        return
+
+    # Load .env before anything (e.g. admin credential seeding) reads the environment
+    load_environment()
+
     # Initialize SQLite database (includes seeding built-in models and API key configs)
     init_database()
 
@@ -257,13 +342,16 @@ def initialize_api_system():
     db_refresh_builtin_models()
     db_refresh_builtin_api_keys()
 
-    # Load API keys into session state
+    # Load API keys (re-reading, since key configs may have changed)
+    clear_api_key_cache()
     load_api_keys()
 
+    _system_initialized = True
+
 
 # ============ API Key Configuration Management ============
 
-def get_all_api_key_configs() -> List[Dict[str, Any]]:
+def get_all_api_key_configs() -> list[dict[str, Any]]:
     """Get all API key configurations from database"""
     return db_get_all_api_key_configs()
 
@@ -275,6 +363,8 @@ def add_api_key_config(
     description: str = ""
 ) -> bool:
     """Add a new API key configuration"""
+    import streamlit as st
+
     # Ensure key_name is in correct format
     if not key_name.endswith("_API_KEY"):
         key_name = f"{key_name.upper()}_API_KEY"
@@ -291,9 +381,8 @@ def add_api_key_config(
     )
 
     if success:
-        # Clear session state to force reload
-        if 'api_keys' in st.session_state:
-            del st.session_state['api_keys']
+        # Force the next load_api_keys() to pick up the new key list
+        clear_api_key_cache()
 
     return success
 
@@ -303,14 +392,13 @@ def remove_api_key_config(key_name: str) -> bool:
     success = db_delete_api_key_config(key_name)
 
     if success:
-        # Clear session state to force reload
-        if 'api_keys' in st.session_state:
-            del st.session_state['api_keys']
+        # Force the next load_api_keys() to pick up the new key list
+        clear_api_key_cache()
 
     return success
 
 
-def get_api_providers_for_dropdown() -> List[Dict[str, str]]:
+def get_api_providers_for_dropdown() -> list[dict[str, str]]:
     """Get list of API providers for dropdown selection in custom model form"""
     configs = db_get_all_api_key_configs()
     return [
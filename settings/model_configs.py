@@ -9,19 +9,24 @@ Author: Derrick Lim
 Date: 3 March 2025
 """
 
-import streamlit as st
-from typing import Dict, Any
+from __future__ import annotations
+
+from collections import ChainMap
+from types import MappingProxyType
+from typing import Any
 
 # Get API keys from the new API management system
 from settings.api_manager import load_api_keys
 
-api_keys = load_api_keys()
-OPENROUTER_API_KEY = api_keys.get("OPENROUTER_API_KEY", "")
+# Static configs leave api_key empty; the current key is layered over the
+# (read-only) config when requested, so edits to secrets take effect
+# without a restart
+OPENROUTER_API_KEY = ""
 
 # OpenRouter DeepSeek (Default for all modules)
 deepseek_config = {
     "provider": "OpenAIChatCompletionClient",
-    "config": {
+    "config": MappingProxyType({
         "model": "deepseek/deepseek-chat",
         "base_url": "https://openrouter.ai/api/v1",
         "api_key": OPENROUTER_API_KEY,
@@ -40,13 +45,13 @@ deepseek_config = {
             "vision": False,
             "structured_output": True
         }
-    }
+    })
 }
 
 # OpenRouter GPT-4o-Mini
 gpt4o_mini_config = {
     "provider": "OpenAIChatCompletionClient",
-    "config": {
+    "config": MappingProxyType({
         "model": "openai/gpt-4o-mini",
         "base_url": "https://openrouter.ai/api/v1",
         "api_key": OPENROUTER_API_KEY,
@@ -65,13 +70,13 @@ gpt4o_mini_config = {
             "vision": False,
             "structured_output": True
         }
-    }
+    })
 }
 
 # OpenRouter Claude Sonnet 3.5
 claude_sonnet_config = {
     "provider": "OpenAIChatCompletionClient",
-    "config": {
+    "config": MappingProxyType({
         "model": "anthropic/claude-3.5-sonnet",
         "base_url": "https://openrouter.ai/api/v1",
         "api_key": OPENROUTER_API_KEY,
@@ -90,13 +95,13 @@ claude_sonnet_config = {
             "vision": True,
             "structured_output": True
         }
-    }
+    })
 }
 
 # OpenRouter Gemini Flash
 gemini_flash_config = {
     "provider": "OpenAIChatCompletionClient",
-    "config": {
+    "config": MappingProxyType({
         "model": "google/gemini-2.0-flash-exp",
         "base_url": "https://openrouter.ai/api/v1",
         "api_key": OPENROUTER_API_KEY,
@@ -115,13 +120,13 @@ gemini_flash_config = {
             "vision": True,
             "structured_output": True
         }
-    }
+    })
 }
 
 # OpenRouter Gemini Pro
 gemini_pro_config = {
     "provider": "OpenAIChatCompletionClient",
-    "config": {
+    "config": MappingProxyType({
         "model": "google/gemini-pro-1.5",
         "base_url": "https://openrouter.ai/api/v1",
         "api_key": OPENROUTER_API_KEY,
@@ -140,12 +145,17 @@ gemini_pro_config = {
             "vision": True,
             "structured_output": True
         }
-    }
+    })
 }
 
 # Set default config to DeepSeek
 default_config = deepseek_config
 
+def _with_api_key(static_config: dict[str, Any]) -> dict[str, Any]:
+    """Return a static OpenRouter config with the current API key overlaid on its shared config."""
+    api_key = load_api_keys().get("OPENROUTER_API_KEY", "")
+    return {**static_config, "config": ChainMap({"api_key": api_key}, static_config["config"])}
+
 # Model choices (All via OpenRouter)
 MODEL_CHOICES = {
     "DeepSeek-Chat": deepseek_config,
@@ -155,7 +165,7 @@ MODEL_CHOICES = {
     "Gemini-Pro": gemini_pro_config
 }
 
-def get_model_config(choice: str) -> Dict[str, Any]:
+def get_model_config(choice: str) -> dict[str, Any]:
     """
     Return the chosen model config dict from SQLite database, or fallback to static config.
 
@@ -191,11 +201,11 @@ def get_model_config(choice: str) -> Dict[str, Any]:
     static_config = MODEL_CHOICES.get(choice, default_config)
     if static_config:
         # Add api_provider for consistency
-        return {**static_config, "api_provider": "OPENROUTER"}
+        return {**_with_api_key(static_config), "api_provider": "OPENROUTER"}
 
-    return {**default_config, "api_provider": "OPENROUTER"}
+    return {**_with_api_key(default_config), "api_provider": "OPENROUTER"}
 
-def get_all_model_choices() -> Dict[str, Dict[str, Any]]:
+def get_all_model_choices() -> dict[str, dict[str, Any]]:
     """
     Get all available model choices using static configurations only
     
@@ -203,22 +213,22 @@ def get_all_model_choices() -> Dict[str, Dict[str, Any]]:
         Dictionary of all available models
     """
     # Return static model configurations only (bypassing UI API manager)
-    return MODEL_CHOICES
+    return {name: _with_api_key(config) for name, config in MODEL_CHOICES.items()}
 
-def get_assessment_default_config() -> Dict[str, Any]:
+def get_assessment_default_config() -> dict[str, Any]:
     """
     Get default model config for Assessment module (DeepSeek via OpenRouter).
 
     Returns:
         Model configuration optimized for content generation
     """
-    return deepseek_config
+    return _with_api_key(deepseek_config)
 
-def get_courseware_default_config() -> Dict[str, Any]:
+def get_courseware_default_config() -> dict[str, Any]:
     """
     Get default model config for Courseware module (DeepSeek via OpenRouter).
 
     Returns:
         Model configuration optimized for document generation
     """
-    return deepseek_config
\ No newline at end of file
+    return _with_api_key(deepseek_config)
\ No newline at end of file
@@ -17,6 +17,7 @@ from typing import Dict, List, Any
 from settings.api_manager import (
     load_api_keys,
     save_api_keys,
+    clear_api_key_cache,
     load_custom_models,
     load_builtin_models,
     add_custom_model,
@@ -69,6 +70,7 @@ def app():
         # Refresh built-in models and API keys from code
         refresh_builtin_models()
         refresh_builtin_api_keys()
+        clear_api_key_cache()
         # Clear relevant session state
         if 'custom_models' in st.session_state:
             del st.session_state['custom_models']
@@ -262,6 +264,7 @@ def manage_api_keys():
             st.success(f"Saved {saved_count} API key(s)!")
             # Clear caches
             st.session_state['api_key_edits'] = {}
+            clear_api_key_cache()
             if 'api_keys' in st.session_state:
                 del st.session_state['api_keys']
             st.rerun()